@@ -1,20 +1,16 @@
 #!/usr/bin/env python3
 
+import io
 import os
 import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterator
 
 import typer
 
-# Attempt to import pyperclip, but make it optional
-try:
-    import pyperclip
-    PYPERCLIP_AVAILABLE = True
-except ImportError:
-    PYPERCLIP_AVAILABLE = False
-    pyperclip = None # Define it as None if not available
-
-
 # --- Configuration ---
 # Files/directories/extensions to ignore by default
 DEFAULT_IGNORE_DIRS: set[str] = {
@@ -30,7 +26,7 @@ DEFAULT_IGNORE_EXTS: set[str] = {
 
 # File extensions often considered binary (can be approximate)
 # We'll ignore these by default unless overridden by not ignoring them explicitly
-BINARY_EXTENSIONS: set[str] = {
+BINARY_EXTENSIONS: frozenset[str] = frozenset({
     # Images
     ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".tif", ".tiff", ".webp",
     # Archives
@@ -48,169 +44,381 @@ BINARY_EXTENSIONS: set[str] = {
     ".sqlite", ".db", ".mdb", ".dbf",
     ".lock", # Often lock files are not human-readable text
     ".woff", ".woff2", ".eot", ".ttf", ".otf", # Fonts
-}
+})
+
+# Leading bytes that identify common binary formats regardless of extension
+BINARY_MAGIC_NUMBERS: tuple[bytes, ...] = (
+    b"\x89PNG\r\n\x1a\n",     # PNG
+    b"\xff\xd8\xff",          # JPEG
+    b"GIF87a", b"GIF89a",     # GIF
+    b"%PDF-",                 # PDF
+    b"PK\x03\x04",            # Zip (also jar, docx, xlsx, ...)
+    b"\x1f\x8b",              # Gzip
+    b"7z\xbc\xaf\x27\x1c",    # 7-Zip
+    b"\xfd7zXZ\x00",          # XZ
+    b"\x7fELF",               # ELF executables/libraries
+    b"\xca\xfe\xba\xbe",      # Java class / Mach-O universal binary
+    b"\xcf\xfa\xed\xfe",      # Mach-O 64-bit
+    b"SQLite format 3\x00",   # SQLite database
+)
+UTF8_BOM = b"\xef\xbb\xbf"
+# Number of leading bytes inspected when guessing whether a file is binary
+BINARY_SNIFF_SIZE = 8192
+# Files at least this large get a sequential-readahead hint before being read
+SEQUENTIAL_HINT_SIZE = 64 * 1024
+# Content of files larger than this (in bytes) is skipped by default
+MAX_INLINE_SIZE = 2 * 1024 * 1024
 
 SEPARATOR = "-" * 80
 
+# Number of threads used to read files concurrently (reads are I/O bound)
+MAX_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# posix_fadvise() is only available on some platforms (not on Windows/macOS)
+HAS_POSIX_FADVISE = hasattr(os, "posix_fadvise")
+
+# Cache of "%Nd | %s" line formatters, keyed by line number width
+_LINE_FORMATTERS: dict[int, Callable[[tuple[int, str]], str]] = {}
+
 # --- Helper Functions ---
 
-def is_likely_binary(file_path: Path) -> bool:
-    """Guess if a file is binary based on extension or content."""
-    if file_path.suffix.lower() in BINARY_EXTENSIONS:
-        return True
-    try:
-        # Try reading a small chunk to detect null bytes, common in binaries
-        with open(file_path, "rb") as f:
-            chunk = f.read(1024) # Read first 1KB
-            if b'\x00' in chunk:
-                return True
-    except Exception:
-        # If reading fails, treat it cautiously as potentially binary or problematic
+def is_likely_binary(head: bytes) -> bool:
+    """Guess if a file is binary based on its first bytes."""
+    if head.startswith(UTF8_BOM):
+        return False # Explicitly marked as UTF-8 text
+    if head.startswith(BINARY_MAGIC_NUMBERS):
         return True
-    return False
+    # Null bytes are common in binaries but almost never appear in text
+    return b'\x00' in head
 
-def format_file_content(file_path: Path, root_dir: Path) -> str:
-    """Formats the content of a single file for Markdown output."""
+def get_extension(name: str) -> str:
+    """Returns the lowercased extension of a file name (like Path.suffix), or ''."""
+    dot = name.rfind('.')
+    # A leading dot (e.g. '.bashrc') marks a hidden file, not an extension
+    return name[dot:].lower() if dot > 0 else ''
+
+def read_text_file(file_path: str, file_size: int | None = None) -> str | None:
+    """
+    Reads a file as UTF-8 text, or returns None if its content looks binary.
+    `file_size` (e.g. from the walk) is only used to decide on a readahead hint,
+    the file is always read up to its current end.
+    """
+    # Unbuffered: we read the whole file at once, so Python's 8KB buffer would only add
+    # extra read() syscalls and copies
+    with open(file_path, "rb", buffering=0) as f:
+        # Small files are read in one read() where a readahead hint gains nothing,
+        # so only spend the extra syscall on large ones
+        if HAS_POSIX_FADVISE and file_size is not None and file_size >= SEQUENTIAL_HINT_SIZE:
+            try:
+                # We read the whole file front to back, so let the kernel read ahead aggressively
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass # Only a hint, some filesystems don't support it
+        # FileIO.readall(): reads to EOF into one buffer sized from fstat(), so a file
+        # that grew since the walk isn't cut off. Then sniff its start.
+        data = f.read()
+        if is_likely_binary(data[:BINARY_SNIFF_SIZE]):
+            return None
+        # Decoding the bytes ourselves also skips TextIOWrapper's newline translation
+        return data.decode("utf-8", errors="ignore")
+
+def format_file_content(
+    file_path: str,
+    root_dir_str: str,
+    has_binary_ext: bool | None = None,
+    file_size: int | None = None,
+    max_file_size: int = MAX_INLINE_SIZE,
+) -> list[str]:
+    """
+    Formats the content of a single file for Markdown output.
+    Returns the output lines, ending with a blank line to separate file blocks.
+    `has_binary_ext` and `file_size` can be passed if the caller already knows them.
+    The content of files larger than `max_file_size` bytes is skipped (0 means no limit).
+    """
     try:
-        relative_path = file_path.relative_to(root_dir)
         # Use forward slashes for cross-platform consistency in output
-        relative_path_str = "/" + str(relative_path.as_posix())
+        relative_path_str = "/" + os.path.relpath(file_path, root_dir_str).replace(os.sep, "/")
     except ValueError:
-        # Should not happen if logic is correct, but handle defensively
-        relative_path_str = f"/{file_path.name}"
+        # Should not happen if logic is correct (e.g. different drives on Windows), but handle defensively
+        relative_path_str = f"/{os.path.basename(file_path)}"
 
     output_lines = [f"{relative_path_str}:", SEPARATOR]
 
-    if is_likely_binary(file_path):
+    if has_binary_ext is None:
+        has_binary_ext = get_extension(os.path.basename(file_path)) in BINARY_EXTENSIONS
+    if has_binary_ext:
         output_lines.append("    [Skipping binary file content]")
     else:
         try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                lines = f.readlines()
-                if not lines:
-                    output_lines.append("    [Empty file]")
+            if file_size is None:
+                file_size = os.stat(file_path).st_size
+            if file_size == 0:
+                # Nothing to read, don't even open the file
+                output_lines.append("    [Empty file]")
+            elif max_file_size and file_size > max_file_size:
+                output_lines.append(f"    [Skipped: file too large ({file_size} bytes)]")
+            else:
+                text = read_text_file(file_path, file_size)
+                if text is None:
+                    output_lines.append("    [Skipping binary file content]")
                 else:
-                    max_line_num_width = len(str(len(lines)))
-                    for i, line in enumerate(lines, start=1):
-                        line_content = line.rstrip('\n\r') # Strip CR and LF
-                        output_lines.append(f"{i:>{max_line_num_width}} | {line_content}")
+                    # Split in C on real line endings only, no per-line rstrip needed. The bytes are
+                    # decoded without newline translation, so \r\n and lone \r are normalized first.
+                    # Not splitlines(): it also breaks on \f, \v, \x1c-\x1e, \x85, \u2028 and \u2029,
+                    # which would shift the line numbers (e.g. ^L page breaks in C/Python sources).
+                    if "\r" in text:
+                        text = text.replace("\r\n", "\n").replace("\r", "\n")
+                    lines = text.split("\n")
+                    if lines[-1] == "":
+                        lines.pop() # A final newline doesn't start another line
+                    if not lines:
+                        output_lines.append("    [Empty file]")
+                    else:
+                        max_line_num_width = len(str(len(lines)))
+                        line_formatter = _LINE_FORMATTERS.get(max_line_num_width)
+                        if line_formatter is None:
+                            line_formatter = _LINE_FORMATTERS.setdefault(
+                                max_line_num_width, f"%{max_line_num_width}d | %s".__mod__
+                            )
+                        # Each (line number, line) tuple from enumerate() is formatted in C
+                        output_lines.extend(map(line_formatter, enumerate(lines, start=1)))
         except OSError as e:
             output_lines.append(f"    [Error reading file: {e}]")
         except Exception as e: # Catch unexpected errors during read
              output_lines.append(f"    [Unexpected error reading file: {e}]")
 
     output_lines.append(SEPARATOR)
-    return "\n".join(output_lines)
+    # Add an extra newline for spacing between file blocks
+    output_lines.append("")
+    return output_lines
+
+def _scan_dir_sorted(dir_path: str) -> list[os.DirEntry]:
+    """Lists a directory's entries sorted by name, or none (with a warning) if it can't be read."""
+    try:
+        with os.scandir(dir_path) as it:
+            # normcase() matches how Path objects sort: case-insensitively on Windows,
+            # and a no-op on POSIX
+            return sorted(it, key=lambda e: os.path.normcase(e.name))
+    except OSError as e:
+        typer.echo(f"Warning: Could not scan directory '{dir_path}': {e}", err=True)
+        return []
 
 # --- Core Logic ---
 
-def generate_markdown(
+def collect_files(
     root_dir: Path,
     ignore_dirs: set[str],
     ignore_files: set[str],
     ignore_exts: set[str],
-) -> str:
-    """Walks the directory and generates the Markdown string."""
-    all_files_to_process: list[Path] = []
+    exclude_path: str | None = None,
+) -> tuple[list[str], list[tuple[str, bool, int | None]]]:
+    """
+    Walks the directory and collects what goes into the Markdown.
+    Returns the top-level structure lines and the sorted (path, has_binary_ext, size)
+    of every file whose content should be included.
+    A file whose path equals exclude_path (e.g. the output file) is left out entirely.
+    """
+    all_files_to_process: list[tuple[str, bool, int | None]] = []
     structure_lines: list[str] = []
 
     # Normalize ignore extensions (ensure they start with '.')
-    normalized_ignore_exts = { f".{ext.lstrip('.')}".lower() for ext in ignore_exts }
+    normalized_ignore_exts = frozenset(f".{ext.lstrip('.')}".lower() for ext in ignore_exts)
+    # Frozen copies of the ignore sets for the membership tests in the walk below
+    ignore_dirs = frozenset(ignore_dirs)
+    ignore_files = frozenset(ignore_files)
 
     # --- Collect all files to process recursively (respecting ignores) ---
-    for dirpath_str, dirnames, filenames in os.walk(root_dir, topdown=True):
-        current_path = Path(dirpath_str)
-
-        # Filter directories based on ignore patterns in-place BEFORE processing files in them
-        # Also filter based on full relative path? No, name check is standard.
-        original_dirnames = list(dirnames) # Copy before modifying
-        dirs_to_remove = {
-            d for d in dirnames
-            if d in ignore_dirs
-        }
-        dirnames[:] = [d for d in dirnames if d not in dirs_to_remove] # Modify in-place for traversal
-
-        # Process files in the *current* directory level of the walk
-        for filename in filenames:
+    # Depth-first walk over os.scandir(): DirEntry already knows whether it is
+    # a directory (d_type on POSIX), so no extra stat() per entry like os.walk.
+    # Each directory's entries are sorted by name and subdirectories are expanded
+    # in place, so files are collected already in full-path order (no global sort).
+    root_dir_str = str(root_dir)
+    # (name, is_dir) of the non-ignored items directly in the root, captured during the walk
+    root_level_entries: list[tuple[str, bool]] = []
+    # Stack of (remaining entries of a directory, depth of that directory)
+    dirs_to_walk: list[tuple[Iterator[os.DirEntry], int]] = [
+        (iter(_scan_dir_sorted(root_dir_str)), 0)
+    ]
+    while dirs_to_walk:
+        entries, depth = dirs_to_walk[-1]
+        at_root = depth == 0
+        for entry in entries:
+            name = entry.name
+            # Don't follow symlinked directories (same as os.walk's default)
+            if entry.is_dir(follow_symlinks=False):
+                # Ignored directories are never descended into, so nothing below them is visited
+                if name not in ignore_dirs:
+                    if at_root:
+                        root_level_entries.append((name, True))
+                    # Descend now; this directory's remaining entries resume afterwards
+                    dirs_to_walk.append((iter(_scan_dir_sorted(entry.path)), depth + 1))
+                    break
+                continue
+            # Skip the output file: it is truncated and written while the files are read
+            if entry.path == exclude_path:
+                continue
+            # Symlinks to files are still included, as before
+            if not entry.is_file():
+                # Symlinked directories aren't walked, but still show up in the top-level listing
+                if at_root and name not in ignore_dirs and entry.is_dir():
+                    root_level_entries.append((name, True))
+                continue
             # Check if the file itself is ignored by name or extension
-            if filename in ignore_files:
+            if name in ignore_files:
                 continue
-            file_full_path = current_path / filename
-            file_ext_lower = file_full_path.suffix.lower()
-            if file_ext_lower in normalized_ignore_exts:
+            # Compute the extension once (without os.path/Path) for both extension checks
+            ext = get_extension(name)
+            if ext in normalized_ignore_exts:
                 continue
-
-            # We don't need to check if the *parent* dir was ignored here,
-            # because os.walk(topdown=True) with dirnames[:] modification
-            # prevents entering ignored directories. Files listed here are
-            # guaranteed to be in non-ignored directories.
-
-            all_files_to_process.append(file_full_path)
+            if at_root:
+                root_level_entries.append((name, False))
+            has_binary_ext = ext in BINARY_EXTENSIONS
+            file_size = None
+            # Binary files are never read, so their size isn't needed (stat() isn't free on POSIX)
+            if not has_binary_ext:
+                try:
+                    # Cached by DirEntry (free on Windows), lets empty/huge files skip the read
+                    file_size = entry.stat().st_size
+                except OSError:
+                    pass # Let format_file_content report the problem
+            all_files_to_process.append((entry.path, has_binary_ext, file_size))
+        else:
+            # All entries of this directory are done
+            dirs_to_walk.pop()
 
 
     # --- Generate the top-level structure list (like tree -L 1) ---
-    try:
-        # List items directly in the root directory
-        root_level_names = sorted(os.listdir(root_dir))
-    except OSError as e:
-        typer.echo(f"Warning: Could not list root directory '{root_dir}': {e}", err=True)
-        root_level_names = []
-
-    items_to_display = []
-    for item_name in root_level_names:
-        item_path = root_dir / item_name
-        is_dir = item_path.is_dir()
-        is_file = item_path.is_file() # Basic check
-
-        # Apply ignore rules to the top-level items
-        if is_dir and item_name in ignore_dirs:
-            continue
-        if is_file and item_name in ignore_files:
-            continue
-        # Check file extension ignore only for files
-        if is_file and item_path.suffix.lower() in normalized_ignore_exts:
-             continue
-
-        # Only add items that are either a directory or a file (skip symlinks etc. for now)
-        if is_dir or is_file:
-             items_to_display.append({"name": item_name, "is_dir": is_dir})
+    # Reuses the root-level entries from the walk instead of listing the root directory
+    # again. They are re-sorted case-sensitively like sorted(os.listdir()) (already the
+    # walk's order on POSIX; the walk's order is case-insensitive on Windows)
+    root_level_entries.sort()
 
     # Format the structure lines for the filtered top-level items
-    num_items = len(items_to_display)
-    for i, item_info in enumerate(items_to_display):
+    num_items = len(root_level_entries)
+    for i, (item_name, is_dir) in enumerate(root_level_entries):
         is_last = (i == num_items - 1)
         prefix = "└── " if is_last else "├── "
-        suffix = "/" if item_info["is_dir"] else ""
-        structure_lines.append(f"{prefix}{item_info['name']}{suffix}")
-
-
-    # --- Generate Output String ---
-    output_parts: list[str] = []
+        suffix = "/" if is_dir else ""
+        structure_lines.append(f"{prefix}{item_name}{suffix}")
+
+    return structure_lines, all_files_to_process
+
+def _prefetch_files(
+    files: list[tuple[str, bool, int | None]],
+    max_file_size: int,
+    stop: threading.Event,
+) -> None:
+    """Asks the kernel to start loading the files into the page cache before they are read."""
+    for file_path, has_binary_ext, file_size in files:
+        if stop.is_set():
+            return
+        # Only prefetch files whose content will actually be read
+        if has_binary_ext or not file_size or (max_file_size and file_size > max_file_size):
+            continue
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue # The reader will report the problem
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass # Only a hint, some filesystems don't support it
+        finally:
+            os.close(fd)
+
+def _iter_formatted_files(
+    files: list[tuple[str, bool, int | None]],
+    root_dir_str: str,
+    max_file_size: int,
+) -> Iterator[list[str]]:
+    """Yields the formatted lines of each file in order, reading ahead on a thread pool."""
+    # Reading files is I/O bound, so overlap the reads across a thread pool.
+    # format_file_content() reports its own errors inline, so no per-file try/except is needed here.
+    num_workers = min(MAX_READ_WORKERS, len(files))
+    if num_workers <= 1:
+        for file_path, has_binary_ext, file_size in files:
+            yield format_file_content(file_path, root_dir_str, has_binary_ext, file_size, max_file_size)
+        return
+
+    # On Linux, warm the page cache for the whole file list from a separate thread,
+    # so the reads below mostly hit memory even on a cold cache
+    stop_prefetch = threading.Event()
+    if HAS_POSIX_FADVISE:
+        threading.Thread(
+            target=_prefetch_files, args=(files, max_file_size, stop_prefetch), daemon=True
+        ).start()
+
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    pending: deque[Future[list[str]]] = deque()
+    try:
+        for file_path, has_binary_ext, file_size in files:
+            pending.append(executor.submit(
+                format_file_content, file_path, root_dir_str, has_binary_ext, file_size, max_file_size
+            ))
+            # Only keep a bounded number of files in flight, so formatted files that
+            # haven't been written out yet don't pile up in memory
+            if len(pending) >= num_workers * 2:
+                yield pending.popleft().result()
+        # Results are taken in submission order, so the walk's sorted order is kept
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        stop_prefetch.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def write_markdown(
+    write: Callable[[str], object],
+    root_dir: Path,
+    structure_lines: list[str],
+    files: list[tuple[str, bool, int | None]],
+    max_file_size: int = MAX_INLINE_SIZE,
+) -> None:
+    """
+    Writes the Markdown for the collected structure and files through `write`
+    (e.g. a file's write method), one file at a time. The output ends with a newline.
+    """
+    wrote_anything = False
 
     # Part 1: The file/directory listing (top level only)
     if structure_lines:
-        # Optional: Add root dir name if desired, e.g., output_parts.append(f"{root_dir.name}/")
-        output_parts.extend(structure_lines)
-        output_parts.append("") # Add a blank line for separation before content
+        # Optional: Add root dir name if desired, e.g., f"{root_dir.name}/"
+        write("\n".join(structure_lines))
+        write("\n")
+        wrote_anything = True
 
     # Part 2: The file contents (all collected files from non-ignored dirs)
-    all_files_to_process.sort() # Sort all collected files by full path for consistent order
-    for file_path in all_files_to_process:
-        try:
-            # We don't need to re-check ignores here, files were filtered during collection
-            file_content_md = format_file_content(file_path, root_dir)
-            output_parts.append(file_content_md)
-            # Add an extra newline for spacing between file blocks
-            output_parts.append("")
-        except Exception as e:
-             # Gracefully handle errors for a single file
-             typer.echo(f"Warning: Could not process file '{file_path}': {e}", err=True)
-
+    for file_lines in _iter_formatted_files(files, str(root_dir), max_file_size):
+        if wrote_anything:
+            write("\n") # Blank line for separation before each block
+        # The lines end with "", so the block ends with a newline
+        write("\n".join(file_lines))
+        wrote_anything = True
+
+def _render_markdown(
+    root_dir: Path,
+    structure_lines: list[str],
+    files: list[tuple[str, bool, int | None]],
+    max_file_size: int,
+) -> str:
+    """Builds the Markdown for the collected structure and files as one string (no final newline)."""
+    # Write into a StringIO so each file's formatted lines can be released right away
+    buf = io.StringIO()
+    write_markdown(buf.write, root_dir, structure_lines, files, max_file_size)
+    # The string form has never ended with a newline; truncate in place rather than copying
+    end = buf.tell()
+    if end:
+        buf.truncate(end - 1)
+    return buf.getvalue()
 
-    # Join all parts with a single newline separating them
-    # (structure list, blank line, file1 content, "", file2 content, "", ...)
-    # The final .strip() will remove any trailing blank line if needed.
-    return "\n".join(output_parts).strip()
+def generate_markdown(
+    root_dir: Path,
+    ignore_dirs: set[str],
+    ignore_files: set[str],
+    ignore_exts: set[str],
+    max_file_size: int = MAX_INLINE_SIZE,
+) -> str:
+    """Walks the directory and generates the Markdown string."""
+    structure_lines, files = collect_files(root_dir, ignore_dirs, ignore_files, ignore_exts)
+    return _render_markdown(root_dir, structure_lines, files, max_file_size)
 
 
 # --- Typer App ---
@@ -258,6 +466,12 @@ def main(
         help="File extension(s) to ignore (e.g., 'log', '.tmp'). Can be used multiple times.",
          show_default=False,
     ),
+    max_file_size: int = typer.Option(
+        MAX_INLINE_SIZE,
+        "--max-file-size",
+        help="Skip the content of files larger than this many bytes (0 for no limit).",
+        min=0,
+    ),
     # Add an option to explicitly include binary files if desired? Maybe later.
     # Add an option to show full tree structure? Maybe later.
 ):
@@ -267,24 +481,31 @@ def main(
     of all non-ignored files (including those in subdirectories).
     """
     # --- Initial Checks ---
-    if to_clipboard and not PYPERCLIP_AVAILABLE:
-        typer.echo("Error: --clipboard requires the 'pyperclip' library.", err=True)
-        typer.echo("Install it using: pip install pyperclip", err=True)
-        raise typer.Exit(code=1)
+    if to_clipboard:
+        # Import pyperclip only when it's needed: importing it probes for the platform's
+        # clipboard tools, which slows down every other run. Still check before doing any work.
+        try:
+            import pyperclip
+        except ImportError:
+            typer.echo("Error: --clipboard requires the 'pyperclip' library.", err=True)
+            typer.echo("Install it using: pip install pyperclip", err=True)
+            raise typer.Exit(code=1)
 
     # Convert lists to sets for efficient lookup during walk
     ignore_dirs_set = set(ignore_dir)
     ignore_files_set = set(ignore_file)
     ignore_exts_set = set(ignore_ext) # Extensions passed via CLI
 
-    # --- Generate the Markdown ---
+    # --- Collect the files to document ---
     typer.echo(f"Processing directory: {repo_path}", err=True) # Info message to stderr
     try:
-        markdown_output = generate_markdown(
+        structure_lines, files_to_process = collect_files(
             repo_path,
             ignore_dirs_set,
             ignore_files_set,
             ignore_exts_set, # Pass CLI ignores here
+            # Don't document the output file if it's inside the repository
+            exclude_path=str(output_file) if output_file else None,
         )
     except Exception as e:
         typer.echo(f"\nAn unexpected error occurred during Markdown generation: {e}", err=True)
@@ -293,7 +514,7 @@ def main(
         raise typer.Exit(code=1)
 
     # --- Handle Output ---
-    if not markdown_output:
+    if not structure_lines and not files_to_process:
         typer.echo("No content generated (perhaps all files were ignored or the directory is empty?).", err=True)
         raise typer.Exit(code=0) # Exit cleanly if nothing to output
 
@@ -302,10 +523,9 @@ def main(
             # Ensure parent directory exists before opening the file
             output_file.parent.mkdir(parents=True, exist_ok=True)
             with open(output_file, "w", encoding="utf-8") as f:
-                f.write(markdown_output)
-                # Ensure a final newline for POSIX compatibility if file is not empty
-                if markdown_output and not markdown_output.endswith('\n'):
-                     f.write('\n')
+                # Stream the Markdown straight into the file (ends with a final newline),
+                # so the whole output never has to be held in memory
+                write_markdown(f.write, repo_path, structure_lines, files_to_process, max_file_size)
             typer.echo(f"Markdown output successfully written to: {output_file}", err=True)
         except IOError as e:
             typer.echo(f"Error: Could not write to output file '{output_file}': {e}", err=True)
@@ -313,16 +533,18 @@ def main(
         except Exception as e:
              typer.echo(f"Error: An unexpected error occurred writing to file '{output_file}': {e}", err=True)
              raise typer.Exit(code=1)
+        return
 
-    elif to_clipboard:
+    if to_clipboard:
+        # The clipboard needs the complete Markdown string
         try:
-            if pyperclip: # Double check availability
-                pyperclip.copy(markdown_output)
-                typer.echo("Markdown output copied to clipboard.", err=True)
-            else:
-                 # This case should be caught earlier, but as a safeguard
-                 typer.echo("Error: pyperclip not available for clipboard operation.", err=True)
-                 raise typer.Exit(code=1)
+            markdown_output = _render_markdown(repo_path, structure_lines, files_to_process, max_file_size)
+        except Exception as e:
+            typer.echo(f"\nAn unexpected error occurred during Markdown generation: {e}", err=True)
+            raise typer.Exit(code=1)
+        try:
+            pyperclip.copy(markdown_output)
+            typer.echo("Markdown output copied to clipboard.", err=True)
         except Exception as e: # Catch potential pyperclip errors
             # Add specific pyperclip exception type if known, e.g., pyperclip.PyperclipException
             typer.echo(f"Error: Could not copy to clipboard: {e}", err=True)
@@ -331,12 +553,14 @@ def main(
     else:
         # Default to stdout
         try:
-            # Use typer.echo to print the final result to stdout
-            # It handles encoding better than print() in some cases
-            typer.echo(markdown_output)
-            # Ensure final newline for stdout as well, typer.echo might handle this?
-            # Check if typer.echo adds a newline by default (it usually does).
-            # If markdown_output might be empty, typer.echo('') is fine.
+            # Stream each file's block to stdout as soon as it is formatted
+            # (the output already ends with a newline)
+            write_markdown(sys.stdout.write, repo_path, structure_lines, files_to_process, max_file_size)
+            # Flush here so a closed pipe is reported below, not at interpreter exit
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away mid-stream (e.g. piped into `head`); let Typer exit quietly
+            raise
         except Exception as e:
             # This might happen if stdout is closed or has encoding issues
             # Using sys.stderr ensures the error message is likely seen